@@ -1,7 +1,12 @@
 import requests
-import json
+import orjson
+import simdjson
 import uuid
+import asyncio
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import pyarrow as pa
 from typing import List, Tuple
 import warnings
 import getpass
@@ -12,24 +17,29 @@ class GeometryScraper:
             cookie = getpass.getpass(prompt='Enter your cookie: ')
         self.cookie = cookie
         self.headers = {'Cookie': cookie}
+        # Reused across batches; each parse() invalidates the previous
+        # document, so extract a batch before parsing the next one
+        self._parser = simdjson.Parser()
         warnings.filterwarnings("ignore", message="Unverified HTTPS request")
 
-    def get_segments(self, locations: List[Tuple[float, float]], buffer_size: int) -> List[str]:
-        url = 'https://pda.ritis.org/api/intersecting_geometry/'
+    def _segments_payload(self, locations: List[Tuple[float, float]], buffer_size: int) -> dict:
+        # Local binding skips a global lookup per value, and float() makes
+        # rows from a numpy array serialize the same as plain tuples
+        _float = float
         geometries = {
             "exclude": [],
             "include": [
                 {
                     "type": "circle",
                     "radius": buffer_size,
-                    "lat": lat,
-                    "lng": lon,
+                    "lat": _float(lat),
+                    "lng": _float(lon),
                     "leafletID": i
                 }
                 for i, (lat, lon) in enumerate(locations)
             ]
         }
-        data = {
+        return {
             "geometries": geometries,
             "states": [],
             "road_classes": [],
@@ -40,13 +50,9 @@ class GeometryScraper:
             "countryCode": "USA",
             "tool_id": "3"
         }
-        response = requests.post(url, headers=self.headers, data=json.dumps(data), verify=False)
-        response.raise_for_status()
-        return response.json()['tmcList']
 
-    def get_geometry(self, tmc_list: List[str]) -> dict:
-        url = 'https://pda.ritis.org/api/xd_coordinates/'
-        payload = {
+    def _geometry_payload(self, tmc_list: List[str]) -> dict:
+        return {
             "datasource_id": "inrix_xd",
             "atlas_version_id": 13,
             "geo_limit": 7000,
@@ -56,39 +62,102 @@ class GeometryScraper:
             "segments": tmc_list,
             "very": False
         }
+
+    def get_segments(self, locations: List[Tuple[float, float]], buffer_size: int) -> List[str]:
+        url = 'https://pda.ritis.org/api/intersecting_geometry/'
+        data = self._segments_payload(locations, buffer_size)
+        response = requests.post(url, headers=self.headers, data=orjson.dumps(data), verify=False)
+        response.raise_for_status()
+        return orjson.loads(response.content)['tmcList']
+
+    def get_geometry(self, tmc_list: List[str]) -> dict:
+        url = 'https://pda.ritis.org/api/xd_coordinates/'
+        payload = self._geometry_payload(tmc_list)
         response = requests.post(url, headers=self.headers, json=payload, verify=False)
         response.raise_for_status()
-        return response.json()
+        return self._parser.parse(response.content)
+
+    async def _aget_segments(self, session: aiohttp.ClientSession, locations: List[Tuple[float, float]], buffer_size: int) -> List[str]:
+        url = 'https://pda.ritis.org/api/intersecting_geometry/'
+        data = self._segments_payload(locations, buffer_size)
+        async with session.post(url, json=data, ssl=False) as response:
+            response.raise_for_status()
+            result = orjson.loads(await response.read())
+        return result['tmcList']
 
-    def extract_data_to_dataframe(self, json_data: dict) -> pd.DataFrame:
-        tmcs_data = json_data['tmcs']
-        df = pd.DataFrame(tmcs_data)
-        
-        for feature in json_data['geojson']['features']:
-            seg_id = feature['id']
-            coordinates = feature['geometry']['coordinates'][0]
-            idx = df.index[df['segID'] == seg_id].tolist()
-            if idx:
-                df.at[idx[0], 'coordinates'] = str(coordinates)
-        
-        return df
+    async def _aget_geometry(self, session: aiohttp.ClientSession, tmc_list: List[str]) -> dict:
+        url = 'https://pda.ritis.org/api/xd_coordinates/'
+        payload = self._geometry_payload(tmc_list)
+        async with session.post(url, json=payload, ssl=False) as response:
+            response.raise_for_status()
+            return self._parser.parse(await response.read())
 
-    def process_locations(self, locations: List[Tuple[float, float]], buffer_size: int) -> pd.DataFrame:
-        print(f"Processing {len(locations)} locations in batches of 500")
-        
+    async def _process_batch(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                             batch_locations: List[Tuple[float, float]], buffer_size: int, batch_number: int) -> tuple:
+        # Semaphore bounds how many batches hit the server at once; the
+        # segments->geometry dependency still runs in order within a batch
+        async with semaphore:
+            print(f"Processing batch {batch_number}")
+            batch_segments = await self._aget_segments(session, batch_locations, buffer_size)
+            batch_geometry_data = await self._aget_geometry(session, batch_segments)
+        return self._extract_batch(batch_geometry_data)
+
+    def _extract_batch(self, json_data) -> tuple:
+        # json_data is a lazy simdjson document: only the fields touched
+        # here get materialized, not the full coordinate arrays
+        tmcs_data = json_data['tmcs'].as_list()
+        coords_map = {
+            feature['id']: feature['geometry']['coordinates'].at_pointer('/0').as_list()
+            for feature in json_data['geojson']['features']
+        }
+        return tmcs_data, coords_map
+
+    def _build_dataframe(self, tmcs_data: list, coords_map: dict) -> pd.DataFrame:
+        # No intersecting segments at all: from_pylist would yield a
+        # zero-column table with no segID to index
+        if not tmcs_data:
+            return pd.DataFrame(columns=['coordinates'])
+        # One Arrow build for everything: typed builders for the tmc
+        # records and a list<list<float64>> column for the coordinates
+        table = pa.Table.from_pylist(tmcs_data)
+        coords_array = pa.array(
+            [coords_map.get(seg_id) for seg_id in table['segID'].to_pylist()],
+            type=pa.list_(pa.list_(pa.float64()))
+        )
+        return table.append_column('coordinates', coords_array).to_pandas()
+
+    def extract_data_to_dataframe(self, json_data) -> pd.DataFrame:
+        tmcs_data, coords_map = self._extract_batch(json_data)
+        return self._build_dataframe(tmcs_data, coords_map)
+
+    async def _process_locations_async(self, locations: List[Tuple[float, float]], buffer_size: int) -> pd.DataFrame:
         batch_size = 500
-        all_dataframes = []
+        semaphore = asyncio.Semaphore(8)
+        timeout = aiohttp.ClientTimeout(total=300)
+        connector = aiohttp.TCPConnector(limit=16, ssl=False)
 
-        for i in range(0, len(locations), batch_size):
-            batch_locations = locations[i:i+batch_size]
-            
-            print(f"Processing batch {i//batch_size + 1}")
-            batch_segments = self.get_segments(batch_locations, buffer_size)
-            batch_geometry_data = self.get_geometry(batch_segments)
-            batch_df = self.extract_data_to_dataframe(batch_geometry_data)
-            all_dataframes.append(batch_df)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout) as session:
+            tasks = [
+                self._process_batch(session, semaphore, locations[i:i+batch_size], buffer_size, i//batch_size + 1)
+                for i in range(0, len(locations), batch_size)
+            ]
+            batch_results = await asyncio.gather(*tasks)
 
         print("Combining all batches into a single DataFrame")
-        final_df = pd.concat(all_dataframes, ignore_index=True)
-        
-        return final_df
\ No newline at end of file
+        all_tmcs = []
+        all_coords = {}
+        for tmcs_data, coords_map in batch_results:
+            all_tmcs.extend(tmcs_data)
+            all_coords.update(coords_map)
+        return self._build_dataframe(all_tmcs, all_coords)
+
+    def process_locations(self, locations: List[Tuple[float, float]], buffer_size: int) -> pd.DataFrame:
+        print(f"Processing {len(locations)} locations in batches of 500")
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._process_locations_async(locations, buffer_size))
+        # An event loop is already running (e.g. Jupyter): asyncio.run
+        # would raise, so run the coroutine on a worker thread's own loop
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self._process_locations_async(locations, buffer_size)).result()
@@ -1,19 +1,38 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-import json
-from datetime import datetime, timezone, timedelta
+import pyarrow as pa
+import orjson
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+import time
 import os
 
 class INRIX_Downloader:
     def __init__(self, app_id_path, hash_token_path, token_path, segments_path, verbose=1):
         self.verbose = verbose
         self._print("Initializing INRIX_Downloader", 2)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=1,
+                              status_forcelist=[429, 500, 502, 503, 504])
+        ))
         self.app_id = self._read_file(app_id_path)
         self.hash_token = self._read_file(hash_token_path)
         self.segments = self._read_segments(segments_path)
+        # Segments never change after init, so join and url-encode the
+        # ids string for each 500-segment batch once up front
+        self._segment_batches = [
+            quote(','.join(self.segments[i:i+500]), safe=',')
+            for i in range(0, len(self.segments), 500)
+        ]
         self.token_path = token_path
         self.token = None
         self.token_expiry = None
+        self._token_expiry_ts = None
         self._load_or_refresh_token()
 
     def _print(self, message, level):
@@ -34,7 +53,7 @@ class INRIX_Downloader:
         try:
             with open(segments_path, 'r') as file:
                 content = file.read().strip()
-                segments = content.split(',')
+                segments = [x.strip() for x in content.split(',')]
             self._print(f"Loaded {len(segments)} segments", 1)
             return segments
         except Exception as e:
@@ -45,10 +64,13 @@ class INRIX_Downloader:
         self._print("Loading or refreshing token", 2)
         try:
             if os.path.exists(self.token_path):
-                with open(self.token_path, 'r') as file:
-                    token_data = json.load(file)
+                with open(self.token_path, 'rb') as file:
+                    token_data = orjson.loads(file.read())
                     self.token = token_data['token']
-                    self.token_expiry = datetime.fromisoformat(token_data['expiry'].replace('Z', '+00:00'))
+                    # Stored as a POSIX timestamp, so no ISO-8601 parsing
+                    # on the common "token still valid" startup path
+                    self._token_expiry_ts = token_data['expiry_ts']
+                    self.token_expiry = datetime.fromtimestamp(self._token_expiry_ts, tz=timezone.utc)
                 self._print("Token loaded from file", 2)
 
             if not self.token or self._token_needs_refresh():
@@ -59,64 +81,69 @@ class INRIX_Downloader:
             self._get_new_token()
 
     def _token_needs_refresh(self):
-        if not self.token_expiry:
+        if not self._token_expiry_ts:
             return True
-        now = datetime.now(timezone.utc)
-        time_until_expiry = self.token_expiry - now
-        self._print(f"Current time (UTC): {now}, Token expiry: {self.token_expiry}", 2)
-        self._print(f"Time until token expiry: {time_until_expiry}", 2)
-        
+        self._print(f"Seconds until token expiry: {self._token_expiry_ts - time.time():.0f}", 2)
+
         # Check if token is already expired or will expire within an hour
-        return time_until_expiry <= timedelta(0) or time_until_expiry < timedelta(hours=1)
+        return time.time() + 3600 >= self._token_expiry_ts
 
     def _get_new_token(self):
         self._print("Getting new token", 2)
         try:
             url = f"https://uas-api.inrix.com/v1/appToken?appId={self.app_id}&hashToken={self.hash_token}"
-            response = requests.get(url)
+            response = self.session.get(url)
             
             response.raise_for_status()  # Raises an HTTPError for bad responses
 
-            token_data = response.json()['result']
+            token_data = orjson.loads(response.content)['result']
             self.token = token_data['token']
             self.token_expiry = datetime.fromisoformat(token_data['expiry'][:-2]).replace(tzinfo=timezone.utc)
-            
-            with open(self.token_path, 'w') as file:
-                json.dump({
+            self._token_expiry_ts = self.token_expiry.timestamp()
+
+            with open(self.token_path, 'wb') as file:
+                file.write(orjson.dumps({
                     'token': self.token,
-                    'expiry': self.token_expiry.isoformat()
-                }, file)
+                    'expiry_ts': self._token_expiry_ts
+                }))
             self._print("New token obtained and saved", 1)
         except Exception as e:
             self._print(f"Error getting new token: {e}", 1)
             raise
 
-    def get_speed_data(self):
-        self._print("Getting speed data", 1)
-        base_url = "https://segment-api.inrix.com/v1/segments/speed"
-        all_data = []
+    def _fetch_batch(self, batch_ids, first, last):
+        self._print(f"Requesting data for segments {first} to {last}", 2)
 
-        try:
-            for i in range(0, len(self.segments), 500):  # Changed from 1000 to 500
-                segment_batch = self.segments[i:i+500]  # Changed from 1000 to 500
+        # batch_ids is already url-encoded, so compose the URL directly
+        # instead of re-quoting the ids on every request
+        url = f"https://segment-api.inrix.com/v1/segments/speed?ids={batch_ids}&accesstoken={quote(self.token)}"
+
+        response = self.session.get(url)
 
-                self._print(f"Requesting data for segments {i+1} to {i+len(segment_batch)}", 2)
+        response.raise_for_status()  # Raises an HTTPError for bad responses
 
-                params = {
-                    'ids': ','.join(segment.strip() for segment in segment_batch),
-                    'accesstoken': self.token
-                    }
+        data = orjson.loads(response.content)['result']['segmentspeeds'][0]['segments']
+        self._print(f"Received data for {len(data)} segments", 2)
+        return data
 
-                response = requests.get(base_url, params=params)
-                         
-                response.raise_for_status()  # Raises an HTTPError for bad responses
+    def get_speed_data(self):
+        self._print("Getting speed data", 1)
+        all_data = []
 
-                data = response.json()['result']['segmentspeeds'][0]['segments']
-                all_data.extend(data)
-                self._print(f"Received data for {len(data)} segments", 2)
+        try:
+            # Batches are independent GETs, so issue them concurrently;
+            # the session's connection pool is shared across workers
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [
+                    executor.submit(self._fetch_batch, batch_ids, i*500+1, min((i+1)*500, len(self.segments)))
+                    for i, batch_ids in enumerate(self._segment_batches)
+                ]
+                for future in as_completed(futures):
+                    all_data.extend(future.result())
 
             self._print(f"Total segments data received: {len(all_data)}", 1)
-            return pd.DataFrame(all_data)
+            # Arrow's typed builders beat pandas' per-row dict inference
+            return pa.Table.from_pylist(all_data).to_pandas(types_mapper=pd.ArrowDtype)
         except Exception as e:
             self._print(f"Error getting speed data: {e}", 1)
             raise
@@ -1,13 +1,18 @@
 import requests
-import duckdb
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import asyncio
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
 import time
 from datetime import datetime, timedelta
 import os
 import uuid
-import io
 import zipfile
 import warnings
-import tempfile
 import shutil
 
 class RITIS_Downloader:
@@ -47,6 +52,17 @@ class RITIS_Downloader:
         self.sleep_time = sleep_time
         self.daily_download_timeout_minutes = daily_download_timeout_minutes
 
+        # One keep-alive session for all sync calls; retries transient
+        # server errors with backoff (429 is returned, not raised, so the
+        # explicit rate-limit handling below still applies)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=1,
+                              status_forcelist=[500, 502, 503, 504],
+                              raise_on_status=False)
+        ))
+
         # supress warnings if verify is False
         if not self.verify:
             warnings.filterwarnings("ignore")
@@ -73,10 +89,8 @@ class RITIS_Downloader:
             print(message)
 
 
-    def _submit_job(self, start_date, end_date, name, attempts=3):
-        self._print(f"Submitting job: start_date={start_date}, end_date={end_date}, name={name}", 2)
-        job_uuid = str(uuid.uuid4())
-        data = {
+    def _job_payload(self, job_uuid, start_date, end_date):
+        return {
             "uuid": job_uuid,
             "segments": {
                 "type": "xd",
@@ -105,13 +119,18 @@ class RITIS_Downloader:
             "travelTimeUnits": self.units,
             "includeIsoTzd": False
         }
-        
+
+    def _submit_job(self, start_date, end_date, name, attempts=3):
+        self._print(f"Submitting job: start_date={start_date}, end_date={end_date}, name={name}", 2)
+        job_uuid = str(uuid.uuid4())
+        data = self._job_payload(job_uuid, start_date, end_date)
+
         self._print(f"Submitting job with UUID: {job_uuid}", 2)
         # Try to submit the job up to n times
         for i in range(attempts):
             sleep_time = 10 * (i**2)
             time.sleep(sleep_time)
-            response = requests.post(f"{self.submit_url}?key={self.api_key}", json=data, verify=self.verify)
+            response = self.session.post(f"{self.submit_url}?key={self.api_key}", json=data, verify=self.verify)
             if response.status_code == 200 or i == attempts-1:
                 break
             else:
@@ -119,7 +138,7 @@ class RITIS_Downloader:
 
         self._print(f"Job submission response: {response.status_code}", 2)
         if response.status_code == 200:
-            job_id = response.json()['id']
+            job_id = orjson.loads(response.content)['id']
             self._print(f"Job submitted successfully. Job ID: {job_id}", 1)
             return job_id, job_uuid
         else:
@@ -127,9 +146,9 @@ class RITIS_Downloader:
             raise Exception(f"Job submission failed: {response.text}")
 
     def _check_job_status(self, job_id):
-        response = requests.get(f"{self.status_url}?key={self.api_key}&jobId={job_id}", verify=self.verify)
+        response = self.session.get(f"{self.status_url}?key={self.api_key}&jobId={job_id}", verify=self.verify)
         if response.status_code == 200:
-            status = response.json()
+            status = orjson.loads(response.content)
             self._print(f"Job Progress: {status['progress']}%", 2)
             return status['state']
         elif response.status_code == 429:
@@ -139,28 +158,204 @@ class RITIS_Downloader:
             self._print(f"Failed to get job status: {response.text}", 1)
             raise Exception(f"Failed to get job status: {response.text}")
 
+    def _poll_intervals(self):
+        # Short delays first so quick jobs are picked up promptly, doubling
+        # up to the configured sleep_time for long-running ones
+        delay = 2
+        while True:
+            yield min(delay, self.sleep_time)
+            delay = min(delay * 2, self.sleep_time)
+
+    def _cache_dir(self):
+        return os.path.join(self.download_path, '.cache')
+
+    def clear_cache(self):
+        """Remove any raw zips cached by _download_and_process_job_results."""
+        cache_dir = self._cache_dir()
+        if os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir)
+        self._print("Cleared download cache", 1)
+
+    def _keep_columns(self, header):
+        # The CSV header doesn't always match the dsFields names sent in
+        # the job request: the travel-time column is renamed by the
+        # configured units (e.g. travel_time_seconds when units='seconds')
+        # and historical_average_speed arrives as average_speed. Accept the
+        # known aliases and keep only columns the export actually contains
+        wanted = {'xd_id', 'measurement_tstamp'}
+        for column in self.columns:
+            wanted.add(column)
+            if column.startswith('travel_time_'):
+                wanted.add(f"travel_time_{self.units}")
+            elif column == 'historical_average_speed':
+                wanted.add('average_speed')
+        return [name for name in header if name in wanted]
+
     def _download_and_process_job_results(self, uuid, job_name):
         self._print(f"Downloading and processing results for UUID: {uuid}", 2)
-        response = requests.get(f"{self.results_url}?key={self.api_key}&uuid={uuid}", stream=True, verify=self.verify)
-        if response.status_code == 200:
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.csv') as temp_file:
-                with zipfile.ZipFile(io.BytesIO(response.content)) as zip_ref:
-                    with zip_ref.open('Readings.csv') as csv_file:
-                        # Use shutil to efficiently copy the file contents
-                        shutil.copyfileobj(csv_file, temp_file) 
-                temp_file_path = temp_file.name
-            try:
-                # Process the CSV data and save as Parquet using DuckDB
-                parquet_filename = os.path.join(self.download_path, f"{job_name}.parquet")
-                duckdb.sql(f"COPY (SELECT * FROM '{temp_file_path}') TO '{parquet_filename}' (FORMAT 'parquet')")
-                self._print(f"Saved parquet file: {parquet_filename}", 1)
-                return True
-            finally:
-                # Ensure temporary file is always removed
-                os.unlink(temp_file_path)
+        # Keep the output inside download_path even if a job name carries
+        # path separators
+        safe_name = str(job_name).replace('/', '_').replace('\\', '_')
+        parquet_filename = os.path.join(self.download_path, f"{safe_name}.parquet")
+        # Already converted on a previous run, nothing to do
+        if os.path.exists(parquet_filename) and os.path.getsize(parquet_filename) > 0:
+            self._print(f"Parquet file already exists, skipping download: {parquet_filename}", 1)
+            return True
+
+        cache_path = os.path.join(self._cache_dir(), f"{uuid}.zip")
+        if os.path.exists(cache_path) and os.path.getsize(cache_path) > 0:
+            self._print(f"Using cached results zip: {cache_path}", 2)
+        else:
+            response = self.session.get(f"{self.results_url}?key={self.api_key}&uuid={uuid}", stream=True, verify=self.verify)
+            if response.status_code != 200:
+                self._print(f"Failed to download results: {response.text}", 1)
+                return None
+            # Stream the zip to disk in 1 MiB chunks so it never sits fully
+            # in RAM; write atomically so a retry after a conversion failure
+            # doesn't re-fetch the whole download
+            os.makedirs(self._cache_dir(), exist_ok=True)
+            with open(f"{cache_path}.tmp", 'wb') as f:
+                for chunk in response.iter_content(1 << 20):
+                    f.write(chunk)
+            os.replace(f"{cache_path}.tmp", cache_path)
+
+        # Stream the CSV out of the zip entry batch by batch into the
+        # Parquet writer so memory stays flat regardless of export size.
+        # Write to a .tmp path and rename on success so an interrupted
+        # conversion can't leave a truncated file that the existence
+        # short-circuit above would mistake for a finished download
+        try:
+            with zipfile.ZipFile(cache_path) as zip_ref:
+                # Only parse the id/timestamp columns plus what was requested
+                # for the job; anything else in the export is never
+                # deserialized. The projection is intersected with the actual
+                # CSV header because RITIS renames some dsFields on export
+                with zip_ref.open('Readings.csv') as csv_file:
+                    header = csv_file.readline().decode().strip().split(',')
+                convert_options = pacsv.ConvertOptions(include_columns=self._keep_columns(header))
+                with zip_ref.open('Readings.csv') as csv_file:
+                    with pacsv.open_csv(csv_file, convert_options=convert_options) as reader:
+                        with pq.ParquetWriter(f"{parquet_filename}.tmp", reader.schema, compression='zstd') as writer:
+                            for batch in reader:
+                                writer.write_batch(batch)
+        except Exception:
+            if os.path.exists(f"{parquet_filename}.tmp"):
+                os.remove(f"{parquet_filename}.tmp")
+            raise
+        os.replace(f"{parquet_filename}.tmp", parquet_filename)
+        self._print(f"Saved parquet file: {parquet_filename}", 1)
+        os.remove(cache_path)
+        return True
+
+    async def _asubmit_job(self, session, start_date, end_date, name, attempts=3):
+        self._print(f"Submitting job: start_date={start_date}, end_date={end_date}, name={name}", 2)
+        job_uuid = str(uuid.uuid4())
+        data = self._job_payload(job_uuid, start_date, end_date)
+
+        self._print(f"Submitting job with UUID: {job_uuid}", 2)
+        # Try to submit the job up to n times
+        for i in range(attempts):
+            sleep_time = 10 * (i**2)
+            await asyncio.sleep(sleep_time)
+            async with session.post(f"{self.submit_url}?key={self.api_key}", json=data) as response:
+                status_code = response.status
+                content = await response.read()
+            if status_code == 200 or i == attempts-1:
+                break
+            else:
+                self._print(f"Job submission attempt {i+1}/{attempts} failed, trying again in {sleep_time} seconds", 1)
+
+        self._print(f"Job submission response: {status_code}", 2)
+        if status_code == 200:
+            job_id = orjson.loads(content)['id']
+            self._print(f"Job submitted successfully. Job ID: {job_id}", 1)
+            return job_id, job_uuid
+        else:
+            self._print(f"Job submission failed: {content}", 1)
+            raise Exception(f"Job submission failed: {content}")
+
+    async def _acheck_job_status(self, session, job_id):
+        async with session.get(f"{self.status_url}?key={self.api_key}&jobId={job_id}") as response:
+            status_code = response.status
+            content = await response.read()
+        if status_code == 200:
+            status = orjson.loads(content)
+            self._print(f"Job Progress: {status['progress']}%", 2)
+            return status['state']
+        elif status_code == 429:
+            self._print(f"Rate limit exceeded with message:\n {content}", 1)
+            return 'RATE_LIMITED'
         else:
-            self._print(f"Failed to download results: {response.text}", 1)
-            return None
+            self._print(f"Failed to get job status: {content}", 1)
+            raise Exception(f"Failed to get job status: {content}")
+
+    async def _await_and_download(self, session, semaphore, date, job_id, job_uuid):
+        job_name = str(date)
+        start_date = date
+        end_date = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        # Failed jobs will be retried once using this counter
+        failed_attempts = 0
+
+        async with semaphore:
+            start_time = datetime.now()
+            max_time = timedelta(minutes=self.daily_download_timeout_minutes)
+            intervals = self._poll_intervals()
+
+            while datetime.now() - start_time < max_time:
+                status = await self._acheck_job_status(session, job_id)
+                if status == 'SUCCEEDED':
+                    # The download + Parquet conversion is blocking I/O and
+                    # CPU work, so run it off the event loop
+                    return bool(await asyncio.to_thread(self._download_and_process_job_results, job_uuid, job_name))
+                elif status in ['KILLED', 'FAILED']:
+                    failed_attempts += 1
+                    if failed_attempts <= 1:
+                        self._print(f"Job {job_id} failed with state: {status}, retrying now", 1)
+                        job_id, job_uuid = await self._asubmit_job(session, start_date, end_date, job_name)
+                    else:
+                        raise Exception(f"Job {job_id} failed with state: {status}")
+                elif status == 'RATE_LIMITED':
+                    self._print(f"Rate limit exceeded, mandatory nap time for 5 minutes...", 1)
+                    await asyncio.sleep(300)
+                await asyncio.sleep(next(intervals))
+            else:
+                raise Exception(f"Job {job_id} timed out after {self.daily_download_timeout_minutes} minutes")
+
+    async def _daily_download_async(self, date_list, submit_gap=2):
+        connector = aiohttp.TCPConnector(limit=8, ssl=None if self.verify else False)
+        # Bounds how many jobs are polled/downloaded at once
+        semaphore = asyncio.Semaphore(4)
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            # Submit all jobs up front with a small gap to respect rate limits
+            jobs = []
+            for date in date_list:
+                end_date = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+                job_id, job_uuid = await self._asubmit_job(session, date, end_date, str(date))
+                jobs.append((date, job_id, job_uuid))
+                await asyncio.sleep(submit_gap)
+
+            # Poll all jobs concurrently and download each as it completes
+            results = await asyncio.gather(
+                *[self._await_and_download(session, semaphore, date, job_id, job_uuid)
+                  for date, job_id, job_uuid in jobs],
+                return_exceptions=True
+            )
+
+        # Only advance last_run through the contiguous prefix of successful
+        # dates so a failed day is picked up again on the next run
+        last_success = None
+        for date, result in zip(date_list, results):
+            if result is not True:
+                break
+            last_success = date
+        if last_success:
+            with open(self.last_run, 'w') as f:
+                f.write(f"{last_success} 00:00:00")
+
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
 
     def _get_dates(self):
         self._print("Getting dates for daily download", 2)
@@ -198,42 +393,16 @@ class RITIS_Downloader:
             self._print("Data is already updated through yesterday, or something went wrong.", 1)
             return
 
-        # Iterate through each date
-        for date in date_list:
-            job_name = str(date)
-            # Use the same date for both start and end, but add one day to the end date
-            start_date = date
-            end_date = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
-            # Failed jobs will be retried once using this counter
-            failed_attempts = 0
-
-            job_id, job_uuid = self._submit_job(start_date, end_date, job_name)
-
-            if job_id:
-                start_time = datetime.now()
-                max_time = timedelta(minutes=self.daily_download_timeout_minutes)
-                
-                while datetime.now() - start_time < max_time:
-                    status = self._check_job_status(job_id)
-                    if status == 'SUCCEEDED':
-                        if self._download_and_process_job_results(job_uuid, job_name):
-                            # Update last run date after each successful download
-                            with open(self.last_run, 'w') as f:
-                                f.write(f"{date} 00:00:00")
-                        break
-                    elif status in ['KILLED', 'FAILED']:
-                        failed_attempts += 1
-                        if failed_attempts <= 1:
-                            self._print(f"Job {job_id} failed with state: {status}, retrying now", 1)
-                            job_id, job_uuid = self._submit_job(start_date, end_date, job_name)
-                        else:
-                            raise Exception(f"Job {job_id} failed with state: {status['state']}")
-                    elif status == 'RATE_LIMITED':
-                        self._print(f"Rate limit exceeded, mandatory nap time for 5 minutes...", 1)
-                        time.sleep(300)
-                    time.sleep(self.sleep_time)
-                else:
-                    raise Exception(f"Job {job_id} timed out after {self.daily_download_timeout_minutes} minutes")
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self._daily_download_async(date_list))
+        else:
+            # Called with an event loop already running (e.g. from a
+            # Jupyter cell), where asyncio.run would raise; run the
+            # coroutine on its own loop in a worker thread instead
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(asyncio.run, self._daily_download_async(date_list)).result()
 
         self._print("Daily download completed", 1)
 
@@ -243,13 +412,14 @@ class RITIS_Downloader:
         job_name = job_name.replace(' ', '_').replace(':', '')
         job_id, job_uuid = self._submit_job(start_date, end_date, job_name)
         if job_id:
+            intervals = self._poll_intervals()
             while True:
                 status = self._check_job_status(job_id)
-                if status['state'] == 'SUCCEEDED':
+                if status == 'SUCCEEDED':
                     self._download_and_process_job_results(job_uuid, job_name)
                     break
-                elif status['state'] in ['KILLED', 'FAILED']:
-                    self._print(f"Job {job_id} failed with state: {status['state']}", 1)
+                elif status in ['KILLED', 'FAILED']:
+                    self._print(f"Job {job_id} failed with state: {status}", 1)
                     break
-                time.sleep(self.sleep_time)
+                time.sleep(next(intervals))
         self._print("Single download completed", 1)
\ No newline at end of file